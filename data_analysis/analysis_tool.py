@@ -15,6 +15,7 @@ from IPython.display import Javascript
 
 _INSTRUCTIONS_INFO_FILE = "../x86-64_instructions.json"
 _DFS = dict()
+_ESTIMATES = dict()
 _INSTRUCTION_PAGES = dict()
 _INSTRUCTIONS_INFO = dict()
 
@@ -35,10 +36,10 @@ for item in _instructions_info:
 
 
 # HELPERS
-def _find_key(name: str) -> str:
+def _find_key(name: str, scope: dict = _DFS) -> str:
     found = False
     key = None
-    for df_key in _DFS:
+    for df_key in scope:
         if df_key == name:
             return df_key
         if df_key.startswith(name):
@@ -398,3 +399,88 @@ def total_groups_histogram(
     total_histogram(names=group_names, percent=percent, ascending=ascending, width=width)
     for group_name in group_names:
         remove_df(group_name)
+
+
+# SAMPLED ESTIMATES
+def load_estimate(name: str, table_path: str) -> None:
+    """!
+    Loads a table produced by the sample-folder command of data collection to the scope of estimates.
+        @param name: Name of the estimate.
+        @param table_path: Path to the csv table.
+    """
+    _ESTIMATES[name] = pd.read_csv(table_path)
+
+
+def get_estimate(name: str) -> pd.DataFrame:
+    """!
+    Returns estimated total instruction usage with confidence intervals by name (or its beginning).
+        @param name: Name of the estimate or its beginning.
+        @return Dataframe with columns "instruction", "estimate", "lower", "upper",
+        "sample_fraction" and "confidence".
+    """
+    return _ESTIMATES[_find_key(name, _ESTIMATES)]
+
+
+def estimates_list() -> list[str]:
+    """!
+    Returns a list of estimate names in the scope.
+        @return List of estimate names.
+    """
+    return list(_ESTIMATES.keys())
+
+
+def sample_fraction(name: str) -> float:
+    """!
+    Returns the fraction of ELF files that was scanned to obtain the estimate.
+        @param name: Name of the estimate or its beginning.
+        @return Sample fraction.
+    """
+    df = get_estimate(name)
+    if len(df) == 0:
+        return 0.0
+    return float(df["sample_fraction"].iloc[0])
+
+
+def estimate_histogram(
+    names: list[str] | None = None, percent: bool = True, ascending: bool = False, width: int = 2000
+) -> None:
+    """!
+    Builds a histogram of the estimated total instruction usage with confidence intervals as error bars.
+        @param names: None or list of estimate names (or their beginnings).
+        If None, all estimates in the scope will be used. Default: None.
+        @param percent: If True, the histogram will be built by percentage, not by absolute values. Default: True.
+        @param ascending: If True, the histogram columns will be sorted in ascending order,
+        otherwise - in descending order. Default: False.
+        @param width: Width of the histogram. Default: 2000.
+    """
+    if names is None:
+        names = estimates_list()
+    bars = []
+    for name in names:
+        key = _find_key(name, _ESTIMATES)
+        df = _ESTIMATES[key].copy()
+        df = df[df["instruction"] != "undefined"]
+        if percent:
+            total = df["estimate"].sum()
+            for column in ["estimate", "lower", "upper"]:
+                df[column] = df[column] / total * 100 if total else 0.0
+        df["name"] = f"{key} (sample fraction: {sample_fraction(key):.2%})"
+        bars.append(df)
+    bars_df = pd.concat(bars, ignore_index=True)
+    order = bars_df.groupby("instruction")["estimate"].sum().sort_values(ascending=ascending).index
+    bars_df["error_plus"] = bars_df["upper"] - bars_df["estimate"]
+    bars_df["error_minus"] = bars_df["estimate"] - bars_df["lower"]
+    fig = px.bar(
+        bars_df,
+        x="instruction",
+        y="estimate",
+        color="name",
+        error_y="error_plus",
+        error_y_minus="error_minus",
+        barmode="group",
+        category_orders={"instruction": list(order)},
+        labels={"estimate": "percent" if percent else "estimate"},
+        width=width,
+    )
+    fig.update_layout(legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="left", x=0))
+    display(fig)
@@ -2,12 +2,16 @@
 import multiprocessing
 import subprocess as sp
 import pandas as pd
+import random
 import click
 import os
 
 from file_generators import user_files_generator, non_recursive_file_generator, recursive_file_generator
+from sampling import STRATA, collect_elf_files, stratify, sample_strata, estimate_totals
+from elf_sections import SectionFilter, select_code
 
 OBJDUMP_ARGS = ["-d", "--no-show-raw-insn", "--no-addresses"]
+OBJDUMP_ADDRESS_ARGS = ["-d", "--no-show-raw-insn"]
 PREFIXES = ["lock", "repne", "repnz", "rep", "repe", "repz", "cs", "ss", "ds", "es", "fs", "gs"]
 ALLOWED_SYMBOLS = "0123456789qazwsxedcrfvtgbyhnujmikolp"
 
@@ -17,6 +21,27 @@ def cli():
     pass
 
 
+def section_filter_options(command):
+    command = click.option(
+        "--exported-only",
+        is_flag=True,
+        help="Disassemble only functions exported in the dynamic symbol table (useful for shared libraries).",
+    )(command)
+    command = click.option(
+        "--exclude-sections",
+        default=None,
+        help="List of executable sections which will not be disassembled, e.g. [.plt*,.init,.fini]. "
+        "Shell-style wildcards are allowed.",
+    )(command)
+    command = click.option(
+        "--sections",
+        default=None,
+        help="List of executable sections to disassemble, e.g. [.text]. Shell-style wildcards are allowed. "
+        "Default: all executable sections.",
+    )(command)
+    return command
+
+
 @cli.command()
 @click.option("--base-dir", "-d", default="/", help="Base directory for scanning.")
 @click.option("--objdump-command", "-o", default="objdump", help="Objdump command.")
@@ -32,17 +57,22 @@ def cli():
     default=None,
     help="List of folders which will be ignored during data collection.",
 )
+@section_filter_options
 @click.argument("table-path")
 def scan_folder(
     base_dir: str,
     objdump_command: str,
     recursive: bool,
     ignore_folders: str | None,
+    sections: str | None,
+    exclude_sections: str | None,
+    exported_only: bool,
     table_path: str,
 ):
     """Walks through the files in the folder (and possibly its subfolders) according to the passed parameters
     and collects data (number of occurrences of each instruction in each code file) in a csv table."""
     validate_objdump(objdump_command)
+    section_filter = make_section_filter(sections, exclude_sections, exported_only)
     n_cores = multiprocessing.cpu_count()
     if ignore_folders:
         ignore_folders = parse_paths(ignore_folders)
@@ -50,12 +80,13 @@ def scan_folder(
         ignore_folders = []
     if recursive:
         file_groups = [
-            (list(recursive_file_generator(base_dir, n_cores, core, ignore_folders)), objdump_command)
+            (list(recursive_file_generator(base_dir, n_cores, core, ignore_folders)), objdump_command, section_filter)
             for core in range(n_cores)
         ]
     else:
         file_groups = [
-            (list(non_recursive_file_generator(base_dir, n_cores, core)), objdump_command) for core in range(n_cores)
+            (list(non_recursive_file_generator(base_dir, n_cores, core)), objdump_command, section_filter)
+            for core in range(n_cores)
         ]
 
     with multiprocessing.Pool() as pool:
@@ -64,6 +95,102 @@ def scan_folder(
     finalize_scan(dfs, table_path)
 
 
+@cli.command()
+@click.option("--base-dir", "-d", default="/", help="Base directory for scanning.")
+@click.option("--objdump-command", "-o", default="objdump", help="Objdump command.")
+@click.option(
+    "--recursive",
+    "-r",
+    is_flag=True,
+    help="Recursively walk a directory tree (starting from base directory).",
+)
+@click.option(
+    "--ignore-folders",
+    "-i",
+    default=None,
+    help="List of folders which will be ignored during data collection.",
+)
+@click.option(
+    "--fraction",
+    "-f",
+    default=0.05,
+    type=click.FloatRange(0, 1, min_open=True),
+    help="Fraction of ELF files to scan in each stratum. Default: 0.05.",
+)
+@click.option(
+    "--strata",
+    "-s",
+    default="size",
+    type=click.Choice(STRATA),
+    help="How ELF files are stratified: by file size or by top-level subdirectory of base directory. Default: size.",
+)
+@click.option(
+    "--confidence",
+    "-c",
+    default=0.95,
+    type=click.FloatRange(0, 1, min_open=True, max_open=True),
+    help="Confidence level of the intervals. Default: 0.95.",
+)
+@click.option("--seed", default=None, type=int, help="Seed of the random sample.")
+@click.option(
+    "--sample-table",
+    default=None,
+    help="Path to save the table with data on the sampled files (in the format of scan-folder).",
+)
+@section_filter_options
+@click.argument("table-path")
+def sample_folder(
+    base_dir: str,
+    objdump_command: str,
+    recursive: bool,
+    ignore_folders: str | None,
+    fraction: float,
+    strata: str,
+    confidence: float,
+    seed: int | None,
+    sample_table: str | None,
+    sections: str | None,
+    exclude_sections: str | None,
+    exported_only: bool,
+    table_path: str,
+):
+    """Walks through the files in the folder (and possibly its subfolders) like scan-folder, but scans only
+    a stratified random sample of ELF files. Saves to a csv table the extrapolated total usage of each instruction
+    with confidence intervals and the fraction of ELF files that was scanned."""
+    validate_objdump(objdump_command)
+    section_filter = make_section_filter(sections, exclude_sections, exported_only)
+    n_cores = multiprocessing.cpu_count()
+    if ignore_folders:
+        ignore_folders = parse_paths(ignore_folders)
+    else:
+        ignore_folders = []
+    if recursive:
+        file_groups = [
+            (list(recursive_file_generator(base_dir, n_cores, core, ignore_folders)),) for core in range(n_cores)
+        ]
+    else:
+        file_groups = [(list(non_recursive_file_generator(base_dir, n_cores, core)),) for core in range(n_cores)]
+
+    with multiprocessing.Pool() as pool:
+        elf_files = [elf_file for group in pool.starmap(collect_elf_files, file_groups) for elf_file in group]
+
+    population = stratify(elf_files, base_dir, strata)
+    sample = sample_strata(population, fraction, random.Random(seed))
+    sampled_files = [file for files in sample.values() for file in files]
+    file_groups = [
+        (list(user_files_generator(sampled_files, n_cores, core)), objdump_command, section_filter)
+        for core in range(n_cores)
+    ]
+
+    with multiprocessing.Pool() as pool:
+        dfs = pool.starmap(scan, file_groups)
+
+    df = merge_scans(dfs)
+    if sample_table:
+        df.to_csv(sample_table, index=False)
+    estimate_totals(df, population, sample, confidence).to_csv(table_path, index=False)
+
+
 @cli.command()
 @click.option("--objdump-command", "-o", default="objdump", help="Objdump command.")
 @click.option(
@@ -73,18 +200,25 @@ def scan_folder(
     help="List of specific files on which program will be run. List items must not be separated by spaces, "
     "otherwise list must be placed in quotes.",
 )
+@section_filter_options
 @click.argument("table-path")
 def scan_files(
     objdump_command: str,
     files: str,
+    sections: str | None,
+    exclude_sections: str | None,
+    exported_only: bool,
     table_path: str,
 ):
     """Walks through the files in the given list
     and collects data (number of occurrences of each instruction in each code file) in a csv table."""
     validate_objdump(objdump_command)
+    section_filter = make_section_filter(sections, exclude_sections, exported_only)
     n_cores = multiprocessing.cpu_count()
     paths = parse_paths(files)
-    file_groups = [(list(user_files_generator(paths, n_cores, core)), objdump_command) for core in range(n_cores)]
+    file_groups = [
+        (list(user_files_generator(paths, n_cores, core)), objdump_command, section_filter) for core in range(n_cores)
+    ]
 
     with multiprocessing.Pool() as pool:
         dfs = pool.starmap(scan, file_groups)
@@ -92,7 +226,7 @@ def scan_files(
     finalize_scan(dfs, table_path)
 
 
-def finalize_scan(dfs: list[pd.DataFrame], table_path: str):
+def merge_scans(dfs: list[pd.DataFrame]) -> pd.DataFrame:
     df = pd.concat(dfs, ignore_index=True).fillna(0)
     if len(df) != 0:
         col = df.pop("filename")
@@ -100,13 +234,29 @@ def finalize_scan(dfs: list[pd.DataFrame], table_path: str):
         df.insert(0, "filename", col)
 
     df.drop_duplicates(inplace=True)
-    df.to_csv(table_path, index=False)
+    return df
+
+
+def finalize_scan(dfs: list[pd.DataFrame], table_path: str):
+    merge_scans(dfs).to_csv(table_path, index=False)
 
 
 def parse_paths(paths: str) -> list[str]:
     return [path.strip().strip("\"'") for path in paths[1:-1].split(",")]
 
 
+def make_section_filter(
+    sections: str | None, exclude_sections: str | None, exported_only: bool
+) -> SectionFilter | None:
+    if not sections and not exclude_sections and not exported_only:
+        return None
+    return SectionFilter(
+        sections=[section for section in parse_paths(sections or "[]") if section],
+        exclude_sections=[section for section in parse_paths(exclude_sections or "[]") if section],
+        exported_only=exported_only,
+    )
+
+
 def validate_objdump(objdump_command: str):
     try:
         sp.run([objdump_command, "-v"], capture_output=False)
@@ -114,12 +264,39 @@ def validate_objdump(objdump_command: str):
         raise Exception(f"No such objdump: {objdump_command}.")
 
 
-def run_objdump(path_to_elf: str, objdump_command: str) -> str:
-    completed_process = sp.run([objdump_command, *OBJDUMP_ARGS, path_to_elf], capture_output=True)
+def run_objdump(path_to_elf: str, objdump_command: str, objdump_args: list[str] = OBJDUMP_ARGS) -> str:
+    completed_process = sp.run([objdump_command, *objdump_args, path_to_elf], capture_output=True)
     completed_process.check_returncode()
     return completed_process.stdout.decode("utf-8")
 
 
+def run_filtered_objdump(path_to_elf: str, objdump_command: str, section_filter: SectionFilter) -> str | None:
+    """Disassembles only the code chosen by the filter. Returns None if there is no such code in the file."""
+    selection = select_code(path_to_elf, section_filter)
+    if not selection.sections:
+        return None
+    section_args = [f"--section={section}" for section in selection.sections]
+    if selection.ranges is None:
+        return run_objdump(path_to_elf, objdump_command, [*OBJDUMP_ARGS, *section_args])
+
+    address_args = [f"--start-address={selection.ranges[0][0]:#x}", f"--stop-address={selection.ranges[-1][1]:#x}"]
+    assembly_listing = run_objdump(path_to_elf, objdump_command, [*OBJDUMP_ADDRESS_ARGS, *section_args, *address_args])
+    return filter_listing(assembly_listing, selection.contains)
+
+
+def filter_listing(assembly_listing: str, address_predicate) -> str:
+    """Leaves instruction lines whose address satisfies the predicate and removes addresses from them."""
+    lines = []
+    for line in assembly_listing.splitlines():
+        address, separator, instruction = line.partition(":")
+        try:
+            if separator and address_predicate(int(address.strip(), 16)):
+                lines.append(instruction)
+        except ValueError:
+            pass
+    return os.linesep.join(lines)
+
+
 def run_readlink(path_to_file: str) -> str:
     completed_process = sp.run(["readlink", "-f", path_to_file], capture_output=True)
     return completed_process.stdout.decode("utf-8").split(os.linesep)[0]
@@ -158,16 +335,21 @@ def get_elf_instructions(assembly_listing: str) -> dict[str, int]:
     return instructions_count
 
 
-def scan(generator, objdump_command: str) -> pd.DataFrame:
+def scan(generator, objdump_command: str, section_filter: SectionFilter | None = None) -> pd.DataFrame:
     data = []
     for file in generator:
         file = run_readlink(file)
         try:
-            assembly_listing = run_objdump(file, objdump_command)
+            if section_filter is None:
+                assembly_listing = run_objdump(file, objdump_command)
+            else:
+                assembly_listing = run_filtered_objdump(file, objdump_command, section_filter)
+                if assembly_listing is None:
+                    continue
             instructions_data = get_elf_instructions(assembly_listing)
             instructions_data["filename"] = file
             data.append(instructions_data)
-        except sp.CalledProcessError:
+        except (sp.CalledProcessError, ValueError, OSError):
             pass
 
     df = pd.DataFrame(data).fillna(0)
@@ -0,0 +1,173 @@
+import bisect
+import struct
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+
+ELF_MAGIC = b"\x7fELF"
+ELFCLASS64 = 2
+ELFDATA2MSB = 2
+EM_ARM = 40
+SHN_UNDEF = 0
+SHN_LORESERVE = 0xFF00
+SHN_XINDEX = 0xFFFF
+SHT_DYNSYM = 11
+SHF_EXECINSTR = 0x4
+STT_FUNC = 2
+STB_GLOBAL = 1
+STB_WEAK = 2
+STV_DEFAULT = 0
+STV_PROTECTED = 3
+
+
+@dataclass(frozen=True)
+class SectionFilter:
+    """Which parts of ELF files are disassembled. Section names may contain shell-style wildcards."""
+
+    sections: list[str] = field(default_factory=list)
+    exclude_sections: list[str] = field(default_factory=list)
+    exported_only: bool = False
+
+    def section_matches(self, name: str) -> bool:
+        if self.sections and not any(fnmatch(name, pattern) for pattern in self.sections):
+            return False
+        return not any(fnmatch(name, pattern) for pattern in self.exclude_sections)
+
+
+@dataclass(frozen=True)
+class Section:
+    name: str
+    type: int
+    flags: int
+    addr: int
+    offset: int
+    size: int
+    link: int
+    entsize: int
+
+
+@dataclass(frozen=True)
+class CodeSelection:
+    """Executable sections to disassemble and, if only some functions are needed,
+    sorted non-overlapping [start, stop) address ranges of these functions."""
+
+    sections: list[str]
+    ranges: list[tuple[int, int]] | None = None
+
+    def contains(self, address: int) -> bool:
+        if self.ranges is None:
+            return True
+        i = bisect.bisect_right(self.ranges, (address, float("inf"))) - 1
+        return i >= 0 and address < self.ranges[i][1]
+
+
+class ElfReader:
+    """Minimal reader of ELF section headers and symbol tables."""
+
+    def __init__(self, file):
+        self.file = file
+        ident = self._read(0, 16)
+        if ident[:4] != ELF_MAGIC:
+            raise ValueError("Not an ELF file.")
+        self.is_64 = ident[4] == ELFCLASS64
+        self.endian = ">" if ident[5] == ELFDATA2MSB else "<"
+        self.machine = self._unpack("H", 18)[0]
+        if self.is_64:
+            shoff = self._unpack("Q", 0x28)[0]
+            shentsize, shnum, shstrndx = self._unpack("HHH", 0x3A)
+            self.section_format, self.symbol_format = "IIQQQQIIQQ", "IBBHQQ"
+        else:
+            shoff = self._unpack("I", 0x20)[0]
+            shentsize, shnum, shstrndx = self._unpack("HHH", 0x2E)
+            self.section_format, self.symbol_format = "IIIIIIIIII", "IIIBBH"
+        self.sections = self._read_sections(shoff, shentsize, shnum, shstrndx)
+
+    def _read(self, offset: int, size: int) -> bytes:
+        self.file.seek(offset)
+        data = self.file.read(size)
+        if len(data) != size:
+            raise ValueError("Truncated ELF file.")
+        return data
+
+    def _unpack(self, fmt: str, offset: int) -> tuple:
+        fmt = self.endian + fmt
+        return struct.unpack(fmt, self._read(offset, struct.calcsize(fmt)))
+
+    def _section_header(self, offset: int) -> tuple:
+        name, sh_type, flags, addr, sh_offset, size, link, _, _, entsize = self._unpack(self.section_format, offset)
+        return name, sh_type, flags, addr, sh_offset, size, link, entsize
+
+    def _read_sections(self, shoff: int, shentsize: int, shnum: int, shstrndx: int) -> list[Section]:
+        if shoff == 0:
+            return []
+        first = self._section_header(shoff)
+        # Extended numbering: real values are stored in the first section header.
+        if shnum == 0:
+            shnum = first[5]
+        if shstrndx == SHN_XINDEX:
+            shstrndx = first[6]
+        headers = [self._section_header(shoff + i * shentsize) for i in range(shnum)]
+        names = b""
+        if shstrndx < len(headers):
+            names = self._read(headers[shstrndx][4], headers[shstrndx][5])
+        return [Section(self._string(names, header[0]), *header[1:]) for header in headers]
+
+    @staticmethod
+    def _string(table: bytes, offset: int) -> str:
+        end = table.find(b"\0", offset)
+        return table[offset : end if end != -1 else len(table)].decode("utf-8", errors="replace")
+
+    def exported_functions(self) -> list[tuple[int, int, int]]:
+        """Returns (section index, start, stop) of functions defined and exported in the dynamic symbol table."""
+        functions = []
+        for section in self.sections:
+            if section.type != SHT_DYNSYM or section.entsize == 0:
+                continue
+            symbols = self._read(section.offset, section.size)
+            for i in range(section.size // section.entsize):
+                entry = struct.unpack_from(self.endian + self.symbol_format, symbols, i * section.entsize)
+                if self.is_64:
+                    _, info, other, shndx, value, size = entry
+                else:
+                    _, value, size, info, other, shndx = entry
+                if info & 0xF != STT_FUNC or info >> 4 not in (STB_GLOBAL, STB_WEAK):
+                    continue
+                if other & 0x3 not in (STV_DEFAULT, STV_PROTECTED) or size == 0:
+                    continue
+                if shndx == SHN_UNDEF or shndx >= SHN_LORESERVE:
+                    continue
+                if self.machine == EM_ARM:
+                    # The lowest bit marks Thumb code and is not a part of the address.
+                    value &= ~1
+                functions.append((shndx, value, value + size))
+        return functions
+
+
+def merge_ranges(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def select_code(path_to_elf: str, section_filter: SectionFilter) -> CodeSelection:
+    """Parses ELF section headers and chooses the code to disassemble according to the filter.
+    Raises ValueError if the file is not a valid ELF file."""
+    with open(path_to_elf, "rb") as file:
+        try:
+            reader = ElfReader(file)
+            selected = {
+                i
+                for i, section in enumerate(reader.sections)
+                if section.flags & SHF_EXECINSTR and section.size != 0 and section_filter.section_matches(section.name)
+            }
+            if not section_filter.exported_only:
+                return CodeSelection([reader.sections[i].name for i in sorted(selected)])
+            functions = [function for function in reader.exported_functions() if function[0] in selected]
+        except struct.error as e:
+            raise ValueError(f"Malformed ELF file: {e}")
+    sections = sorted({shndx for shndx, _, _ in functions})
+    ranges = merge_ranges([(start, stop) for _, start, stop in functions])
+    return CodeSelection([reader.sections[i].name for i in sections], ranges)
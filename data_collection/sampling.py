@@ -0,0 +1,97 @@
+import os
+import random
+from statistics import NormalDist
+
+import pandas as pd
+
+from elf_sections import ELF_MAGIC
+
+STRATA = ["size", "directory"]
+
+
+def is_elf(path: str) -> bool:
+    try:
+        with open(path, "rb") as file:
+            return file.read(len(ELF_MAGIC)) == ELF_MAGIC
+    except OSError:
+        return False
+
+
+def collect_elf_files(generator) -> list[tuple[str, str, int]]:
+    """Returns (path, resolved path, size) for every ELF file yielded by the generator."""
+    elf_files = []
+    for file in generator:
+        if not os.path.isfile(file) or not is_elf(file):
+            continue
+        resolved = os.path.realpath(file)
+        elf_files.append((file, resolved, os.path.getsize(resolved)))
+    return elf_files
+
+
+def stratum_key(path: str, size: int, base_dir: str, strata: str) -> str:
+    if strata == "size":
+        # Files are grouped into buckets whose sizes differ by a factor of four.
+        return f"size-{size.bit_length() // 2}"
+    relative_dir = os.path.relpath(os.path.dirname(path), base_dir)
+    return f"dir-{relative_dir.split(os.sep)[0]}"
+
+
+def stratify(elf_files: list[tuple[str, str, int]], base_dir: str, strata: str) -> dict[str, list[str]]:
+    """Splits ELF files into strata. Files reachable by several paths are counted once."""
+    population = dict()
+    seen = set()
+    for path, resolved, size in elf_files:
+        if resolved in seen:
+            continue
+        seen.add(resolved)
+        population.setdefault(stratum_key(path, size, base_dir, strata), []).append(resolved)
+    return population
+
+
+def sample_strata(population: dict[str, list[str]], fraction: float, rng: random.Random) -> dict[str, list[str]]:
+    """Draws a simple random sample from each stratum (proportional allocation).
+    At least two files are taken from every stratum so that its variance can be estimated."""
+    sample = dict()
+    for key in sorted(population):
+        files = sorted(population[key])
+        n = min(len(files), max(2, round(fraction * len(files))))
+        sample[key] = rng.sample(files, n)
+    return sample
+
+
+def estimate_totals(
+    df: pd.DataFrame,
+    population: dict[str, list[str]],
+    sample: dict[str, list[str]],
+    confidence: float,
+) -> pd.DataFrame:
+    """Extrapolates total instruction usage from the sampled files (stratified estimator of a total)
+    and builds normal-approximation confidence intervals."""
+    instructions = [column for column in df.columns if column != "filename"]
+    counts = df.set_index("filename")[instructions] if len(df) != 0 else pd.DataFrame(columns=instructions)
+    estimate = pd.Series(0.0, index=instructions)
+    variance = pd.Series(0.0, index=instructions)
+    for key, files in sample.items():
+        population_size, sample_size = len(population[key]), len(files)
+        # Sampled files without code (or rejected by objdump) contribute zero to every instruction.
+        stratum = counts.reindex(files).fillna(0).astype(float)
+        estimate += population_size * stratum.mean()
+        if sample_size > 1:
+            correction = 1 - sample_size / population_size
+            variance += population_size**2 * correction * stratum.var(ddof=1) / sample_size
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    margin = z * variance.pow(0.5)
+    sampled_files = sum(len(files) for files in sample.values())
+    total_files = sum(len(files) for files in population.values())
+    result = pd.DataFrame(
+        {
+            "instruction": instructions,
+            "estimate": estimate.round(2).values,
+            "lower": (estimate - margin).clip(lower=0).round(2).values,
+            "upper": (estimate + margin).round(2).values,
+        }
+    )
+    result["sample_fraction"] = sampled_files / total_files if total_files else 0.0
+    result["confidence"] = confidence
+    return result.sort_values(by="estimate", ascending=False).reset_index(drop=True)